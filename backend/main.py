@@ -1,20 +1,32 @@
 import os
 import json
+import re
+import threading
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
+from typing import Any
 from dotenv import load_dotenv
 
+import anyio.to_thread
+from cachetools import TTLCache
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
+import httplib2
 from google.oauth2.service_account import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 
 # --- Langchain Imports ---
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain_core.prompts import PromptTemplate
-from langchain_core.tools import Tool
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.agents import AgentFinish
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.tools import StructuredTool
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.memory import ConversationBufferMemory
+from langchain.memory import ConversationSummaryBufferMemory
 from langchain_core.messages import AIMessage, HumanMessage
 
 
@@ -23,11 +35,22 @@ from langchain_core.messages import AIMessage, HumanMessage
 # Load environment variables from .env file
 load_dotenv()
 
+# Max number of /chat requests handled at the same time. The agent and Google
+# client are blocking, so each request occupies one worker thread.
+THREADPOOL_SIZE = int(os.getenv('THREADPOOL_SIZE', '64'))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Enlarge the threadpool FastAPI uses for sync endpoints (default is 40).
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    yield
+
 # FastAPI app initialization
 app = FastAPI(
     title="TailorTalk Agent API",
     description="API for the conversational AI agent to book appointments.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # --- Google Calendar and LLM Setup ---
@@ -36,62 +59,187 @@ SERVICE_ACCOUNT_FILE = 'credentials.json'
 CALENDAR_ID = os.getenv('CALENDAR_ID')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
+# Optional: when set, chat memory is stored in Redis so any worker can serve any session.
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    import redis
+    from langchain_community.chat_message_histories import RedisChatMessageHistory
+
+    # One client (and connection pool) per process, shared by every session.
+    # Responses stay as bytes because RedisChatMessageHistory decodes them itself.
+    redis_client = redis.Redis.from_url(REDIS_URL)
+
+# India Standard Time, the timezone assumed for users' requests.
+IST = timezone(timedelta(hours=5, minutes=30))
+
 credentials = Credentials.from_service_account_file(
         SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-service = build('calendar', 'v3', credentials=credentials)
+# Use the discovery document bundled with the client library instead of
+# fetching it over the network when the worker starts.
+service = build('calendar', 'v3', credentials=credentials, static_discovery=True, cache_discovery=False)
+
+# httplib2.Http is not thread-safe and /chat runs in a threadpool, so each thread
+# gets its own authorized client. Reusing it keeps the connection (and TLS
+# session) to Google open across API calls.
+_thread_local = threading.local()
+
+def _http() -> AuthorizedHttp:
+    """Returns the current thread's authorized HTTP client for Google API calls."""
+    http = getattr(_thread_local, 'http', None)
+    if http is None:
+        http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=30))
+        _thread_local.http = http
+    return http
 
 
 llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=GEMINI_API_KEY)
 
 
-# --- Pydantic Schema for Tool Input ---
+# --- Pydantic Schemas for Tool Input ---
+class CheckAvailabilitySchema(BaseModel):
+    time: str = Field(description="Slot start time, ISO 8601.")
+
+
 class BookAppointmentSchema(BaseModel):
-    time: str = Field(description="The start time for the event in ISO 8601 format.")
-    summary: str = Field(description="The title or summary of the event.")
+    time: str = Field(description="Event start time, ISO 8601.")
+    summary: str = Field(description="Event title.")
 
 
 # --- Google Calendar Tool Functions ---
 
-def check_calendar_availability(time_str: str) -> str:
+class BookingConfirmation(str):
+    """A booking tool's success message, which is sent to the user as-is."""
+
+def _parse_time(time: str) -> datetime:
+    """Parses an ISO 8601 time string into an IST datetime, assuming IST if no offset is given."""
+    dt = datetime.fromisoformat(time.strip())
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=IST)
+    return dt.astimezone(IST)
+
+# Short-lived cache of FreeBusy results. The agent often checks a slot and then
+# re-checks it before booking, so repeat lookups within a minute skip the API call.
+# The cache is per process and a booking can't clear other workers' copies, so it
+# is only used when uvicorn runs a single worker (WEB_CONCURRENCY, as uvicorn reads it).
+BUSY_CACHE_ENABLED = int(os.getenv('WEB_CONCURRENCY', '1')) <= 1
+busy_cache = TTLCache(maxsize=2048, ttl=60)
+busy_cache_lock = threading.Lock()
+# Bumped on every invalidation. A query only stores its result if no invalidation
+# happened since it started, so a slow query can't cache a pre-booking "free".
+busy_cache_generation = 0
+
+# FreeBusy calls currently in progress, keyed by their arguments. Tools run on
+# worker threads, so these are thread futures rather than asyncio ones.
+busy_inflight = {}
+busy_inflight_lock = threading.Lock()
+
+def _single_flight(key, func):
+    """
+    Calls `func` once for all concurrent callers with the same key.
+    The first caller makes the call; the others wait for and share its result.
+    """
+    with busy_inflight_lock:
+        future = busy_inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = busy_inflight[key] = Future()
+
+    if not is_leader:
+        return future.result()
+
+    try:
+        result = func()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        # Also covers KeyboardInterrupt/SystemExit, so followers never wait forever.
+        future.set_exception(e)
+        raise
+    finally:
+        with busy_inflight_lock:
+            del busy_inflight[key]
+
+def _busy(calendar_id: str, start_iso: str, end_iso: str) -> list:
+    """Returns the busy intervals of a calendar between two ISO 8601 times."""
+    key = (calendar_id, start_iso, end_iso)
+    with busy_cache_lock:
+        generation = busy_cache_generation
+        if BUSY_CACHE_ENABLED and key in busy_cache:
+            return busy_cache[key]
+
+    def query():
+        freebusy_result = service.freebusy().query(body={
+            "timeMin": start_iso,
+            "timeMax": end_iso,
+            "items": [{"id": calendar_id}],
+        }).execute(http=_http())
+        calendar = freebusy_result['calendars'][calendar_id]
+        # Per-calendar failures (e.g. notFound, forbidden) come back with an empty
+        # busy list rather than an HTTP error, so they must not be read as "free".
+        if calendar.get('errors'):
+            reasons = ', '.join(error.get('reason', 'unknown') for error in calendar['errors'])
+            raise RuntimeError(f"Could not read the calendar's availability ({reasons}).")
+        return calendar.get('busy', [])
+
+    # The cache only helps once a result is stored, so concurrent misses for the
+    # same slot are coalesced into a single API call. The generation is part of the
+    # key so callers arriving after a booking don't join a query started before it.
+    busy = _single_flight(key + (generation,), query)
+
+    with busy_cache_lock:
+        if BUSY_CACHE_ENABLED and generation == busy_cache_generation:
+            busy_cache[key] = busy
+    return busy
+
+def _invalidate_busy_cache():
+    """Drops cached FreeBusy results after the calendar has been changed."""
+    # A new 1-hour event can overlap slots starting at other minutes too, so the
+    # whole (small, short-lived) cache is cleared rather than a single bucket.
+    global busy_cache_generation
+    with busy_cache_lock:
+        busy_cache_generation += 1
+        busy_cache.clear()
+
+def check_calendar_availability(time: str) -> str:
     """
     Checks the Google Calendar for events at a specified time to see if it's free.
-    The input must be a single string in ISO 8601 format.
+    Uses the FreeBusy API and only lists events when the slot is busy.
+    The time must be in ISO 8601 format.
     """
     try:
-        time_str = time_str.strip()
-        start_dt = datetime.fromisoformat(time_str)
+        # Round down to the minute so nearby checks of the same slot share a cache entry.
+        start_dt = _parse_time(time).replace(second=0, microsecond=0)
         end_dt = start_dt + timedelta(hours=1)
-        
+
+        busy = _busy(CALENDAR_ID, start_dt.isoformat(), end_dt.isoformat())
+
+        if not busy:
+            return f"The 1-hour slot starting at {start_dt.strftime('%I:%M %p')} is free."
+
+        # FreeBusy only returns busy intervals, so list the events to name the conflicts.
+        # Only the titles are needed, so ask for just those to keep the response small.
         events_result = service.events().list(
             calendarId=CALENDAR_ID, timeMin=start_dt.isoformat(),
             timeMax=end_dt.isoformat(), singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        
-        events = events_result.get('items', [])
+            orderBy='startTime', maxResults=5, fields="items(summary)"
+        ).execute(http=_http())
 
-        if not events:
-            return f"The 1-hour slot starting at {start_dt.strftime('%I:%M %p')} is free."
-        else:
-            event_list = [f"'{event['summary']}'" for event in events]
-            return f"The requested time slot is busy. It conflicts with: {', '.join(event_list)}."
+        events = events_result.get('items', [])
+        event_list = [f"'{event.get('summary', 'Busy')}'" for event in events] or ["an existing event"]
+        return f"The requested time slot is busy. It conflicts with: {', '.join(event_list)}."
     except Exception as e:
         return f"An error occurred: {e}"
 
-def book_appointment(input_str: str) -> str:
+def book_appointment(time: str, summary: str) -> str:
     """
     Books a 1-hour appointment on Google Calendar.
-    The input must be a JSON-like string containing a 'time' in ISO 8601 format and a 'summary'.
+    The time must be in ISO 8601 format and the summary is the event title.
     """
     try:
-        # The AI will send a string that looks like a dictionary.
-        # We parse it into a real dictionary.
-        args = json.loads(input_str.replace("'", '"'))
-
-        time_str = args['time'].strip()
-        summary = args['summary'].strip()
+        summary = summary.strip()
 
-        start_dt = datetime.fromisoformat(time_str)
+        start_dt = _parse_time(time)
         end_dt = start_dt + timedelta(hours=1)
         
         event = {
@@ -99,83 +247,312 @@ def book_appointment(input_str: str) -> str:
             'start': {'dateTime': start_dt.isoformat()},
             'end': {'dateTime': end_dt.isoformat()},
         }
-        created_event = service.events().insert(calendarId=CALENDAR_ID, body=event).execute()
+        created_event = service.events().insert(calendarId=CALENDAR_ID, body=event).execute(http=_http())
+        _invalidate_busy_cache()
         
-        return f"Success! The appointment '{summary}' has been booked for {start_dt.strftime('%A, %B %d at %I:%M %p')}. Event link: {created_event.get('htmlLink')}"
+        return BookingConfirmation(f"Success! The appointment '{summary}' has been booked for {start_dt.strftime('%A, %B %d at %I:%M %p')}. Event link: {created_event.get('htmlLink')}")
+    except Exception as e:
+        return f"An error occurred while booking: {e}"
+
+def _delete_tentative_event(created_event: dict):
+    """
+    Deletes an event inserted by check_and_book. Returns None on success, or a
+    message telling the user the event may still be on the calendar.
+    """
+    try:
+        service.events().delete(calendarId=CALENDAR_ID, eventId=created_event['id'], sendUpdates="none").execute(http=_http())
+        return None
+    except Exception as e:
+        return (f"The tentative event could not be removed ({e}), so it may still be on the calendar. "
+                f"Event id: {created_event.get('id')}. Event link: {created_event.get('htmlLink')}")
+    finally:
+        # A FreeBusy lookup running meanwhile may have seen (and cached) the
+        # tentative event as busy, so drop cached results either way.
+        _invalidate_busy_cache()
+
+def check_and_book(time: str, summary: str) -> str:
+    """
+    Checks availability and books a 1-hour appointment in a single batched HTTP call.
+    The time must be in ISO 8601 format and the summary is the event title.
+    """
+    try:
+        summary = summary.strip()
+
+        start_dt = _parse_time(time)
+        end_dt = start_dt + timedelta(hours=1)
+
+        event = {
+            'summary': summary,
+            'start': {'dateTime': start_dt.isoformat()},
+            'end': {'dateTime': end_dt.isoformat()},
+        }
+
+        # Requests inside a batch run in no guaranteed order, so the availability
+        # check lists events (with ids) rather than using FreeBusy. That lets us
+        # ignore our own new event if the insert happened to run first.
+        results = {}
+
+        def collect(request_id, response, exception):
+            results[request_id] = (response, exception)
+
+        batch = service.new_batch_http_request(callback=collect)
+        batch.add(service.events().list(
+            calendarId=CALENDAR_ID, timeMin=start_dt.isoformat(),
+            timeMax=end_dt.isoformat(), singleEvents=True,
+            fields="items(id,summary,transparency)"
+        ), request_id="availability")
+        batch.add(service.events().insert(
+            calendarId=CALENDAR_ID, body=event, sendUpdates="none"
+        ), request_id="booking")
+        batch.execute(http=_http())
+
+        created_event, booking_error = results.get("booking", (None, None))
+        events_result, availability_error = results.get("availability", (None, None))
+
+        if booking_error:
+            return f"An error occurred while booking: {booking_error}"
+        if created_event is None:
+            return "An error occurred while booking: Google Calendar did not return the new event."
+        if availability_error or events_result is None:
+            delete_error = _delete_tentative_event(created_event)
+            if delete_error:
+                return f"An error occurred while checking availability: {availability_error}. {delete_error}"
+            return f"An error occurred while checking availability, so nothing was booked: {availability_error}"
+
+        # Transparent ("show as available") events don't block the slot, matching
+        # what FreeBusy reports to CheckCalendarAvailability.
+        conflicts = [
+            e for e in events_result.get('items', [])
+            if e.get('id') != created_event['id'] and e.get('transparency') != 'transparent'
+        ]
+        if conflicts:
+            # Compensate for the tentative insert so the calendar is left untouched.
+            delete_error = _delete_tentative_event(created_event)
+            event_list = [f"'{e.get('summary', 'Busy')}'" for e in conflicts]
+            if delete_error:
+                return f"The requested time slot is busy. It conflicts with: {', '.join(event_list)}. {delete_error}"
+            return f"The requested time slot is busy, so nothing was booked. It conflicts with: {', '.join(event_list)}."
+
+        _invalidate_busy_cache()
+        return BookingConfirmation(f"Success! The slot was free and the appointment '{summary}' has been booked for {start_dt.strftime('%A, %B %d at %I:%M %p')}. Event link: {created_event.get('htmlLink')}")
     except Exception as e:
         return f"An error occurred while booking: {e}"
 
 # --- Langchain Agent Setup ---
 
 # 1. Define the tools
+# Structured tools let the model pass typed arguments via native function calling,
+# so there is no hand-rolled JSON parsing of the tool input.
 tools = [
-    Tool(
-        name="CheckCalendarAvailability",
+    StructuredTool.from_function(
         func=check_calendar_availability,
-        description="Use this to check if a specific time slot is available in the calendar. The input must be a single string representing the date and time in ISO 8601 format."
+        name="CheckCalendarAvailability",
+        description="Check if a 1-hour slot is free.",
+        args_schema=CheckAvailabilitySchema,
     ),
-    # REPLACE the BookAppointment tool with this simple version
-    Tool(
-        name="BookAppointment",
+    StructuredTool.from_function(
         func=book_appointment,
-        description="Use this to book a new 1-hour appointment in the calendar. The input must be a JSON-like string containing a 'time' key with the time in ISO 8601 format, and a 'summary' key with the appointment title."
+        name="BookAppointment",
+        description="Book a 1-hour appointment.",
+        args_schema=BookAppointmentSchema,
+    ),
+    StructuredTool.from_function(
+        func=check_and_book,
+        name="CheckAndBook",
+        description="Check and book a 1-hour appointment in one step once the user has confirmed; books nothing if busy.",
+        args_schema=BookAppointmentSchema,
     ),
 ]
 
 # 2. Create the Prompt Template
-prompt_template = """
-You are a friendly and helpful AI assistant named TailorTalk. Your goal is to help users book appointments in their Google Calendar.
-
-You have access to the following tools:
-{tools}
+# Kept short on purpose: this is sent with every LLM call, and input tokens
+# dominate latency for short replies.
+prompt_template = (
+    "You are TailorTalk, a friendly assistant that books appointments in the user's Google Calendar. "
+    "Today is {today}. Assume times are IST (UTC+5:30), today or later, and pass them to tools "
+    "as ISO 8601 with the offset, e.g. {example_iso_time}. Ask for clarification if a request is "
+    "ambiguous, and check availability before booking unless the user says not to."
+)
 
-To use a tool, please use the following format:
-Thought: Do I need to use a tool? Yes
-Action: the action to take, should be one of [{tool_names}]
-Action Input: the input to the action
-Observation: the result of the action
+prompt = ChatPromptTemplate.from_messages([
+    ("system", prompt_template),
+    MessagesPlaceholder("chat_history"),
+    ("human", "{input}"),
+    MessagesPlaceholder("agent_scratchpad"),
+])
 
+def get_agent_inputs(message: str) -> dict:
+    """
+    Builds the agent's input for a message. The dates are computed per request,
+    so a long-running process never serves a stale date.
+    """
+    now = datetime.now(IST)
+    return {
+        "input": message,
+        "today": now.strftime('%Y-%m-%d'),
+        "example_iso_time": now.isoformat(),
+    }
 
-When you have a response to say to the Human, or if you do not need to use a tool, you MUST use the format:
-Thought: Do I need to use a tool? No
-Final Answer: [your response here]
+# 3. Create the agent
+# The tag marks the agent's own LLM calls, so streaming can skip the memory's
+# summarisation calls that share the same model.
+AGENT_TAG = "agent"
+agent = create_tool_calling_agent(llm, tools, prompt).with_config(tags=[AGENT_TAG])
 
+# 4. Create the Agent Executor
+# Each session keeps a summary buffer so older turns are rolled up into a short
+# summary instead of resending the whole transcript to the LLM.
+# Sessions are kept in a bounded cache and dropped after an hour of inactivity,
+# so the store doesn't grow forever with one entry per frontend session id.
+SESSION_TTL = 3600
+chat_histories = TTLCache(maxsize=10_000, ttl=SESSION_TTL)
+chat_histories_lock = threading.Lock()
 
-IMPORTANT:
-- Today's date is {today}.
-- Always be conversational and ask for clarification if the user's request is ambiguous.
-- Before booking, always confirm the availability first unless the user explicitly asks to book without checking.
-- The user's timezone is likely India Standard Time (IST, UTC+5:30). When you need to generate a time string for the tools, assume it's for today or a future date and include the timezone offset. For example: `{example_iso_time}`.
 
-Begin!
+def _estimate_tokens(message) -> int:
+    """Roughly estimates a message's token count (about 4 characters per token)."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return len(content) // 4 + 4
 
-Previous conversation history:
-{chat_history}
 
-New input: {input}
-{agent_scratchpad}
-"""
+class SummaryBufferMemory(ConversationSummaryBufferMemory):
+    """
+    Summary buffer memory that estimates token counts locally. The base class
+    asks Gemini's count_tokens API once per message, after every turn.
+    """
 
-today = datetime.now().strftime('%Y-%m-%d')
-example_iso_time = datetime.now(timezone(timedelta(hours=5, minutes=30))).isoformat()
+    def _pop_overflow(self, buffer: list) -> list:
+        """Pops the oldest messages off `buffer` until it fits the token limit, and returns them."""
+        buffer_length = sum(_estimate_tokens(message) for message in buffer)
+        pruned_memory = []
+        while buffer and buffer_length > self.max_token_limit:
+            message = buffer.pop(0)
+            buffer_length -= _estimate_tokens(message)
+            pruned_memory.append(message)
+        return pruned_memory
+
+    def prune(self) -> None:
+        pruned_memory = self._pop_overflow(self.chat_memory.messages)
+        if pruned_memory:
+            self.moving_summary_buffer = self.predict_new_summary(pruned_memory, self.moving_summary_buffer)
+
+    async def aprune(self) -> None:
+        pruned_memory = self._pop_overflow(self.chat_memory.messages)
+        if pruned_memory:
+            self.moving_summary_buffer = await self.apredict_new_summary(pruned_memory, self.moving_summary_buffer)
+
+
+class RedisSummaryBufferMemory(SummaryBufferMemory):
+    """Summary buffer memory whose messages and running summary both live in Redis."""
+
+    redis_client: Any
+    summary_key: str
+
+    def prune(self) -> None:
+        # The base class trims by popping from `chat_memory.messages`, but the Redis
+        # history returns a fresh list on every read, so the trim and the new summary
+        # have to be written back explicitly.
+        pruned_memory = self._pop_overflow(self.chat_memory.messages)
+        with self.redis_client.pipeline(transaction=True) as pipe:
+            if pruned_memory:
+                self.moving_summary_buffer = self.predict_new_summary(pruned_memory, self.moving_summary_buffer)
+                # Messages are stored newest-first, so drop the pruned ones off the
+                # tail. Trimming by count (not by the length we read) keeps any turn
+                # another worker pushed in the meantime.
+                pipe.ltrim(self.chat_memory.key, 0, -len(pruned_memory) - 1)
+                pipe.set(self.summary_key, self.moving_summary_buffer)
+            # Keep the summary alive as long as the session's messages.
+            pipe.expire(self.summary_key, SESSION_TTL)
+            pipe.execute()
+
+    async def aprune(self) -> None:
+        # The inherited aprune would trim a throwaway copy of the Redis messages
+        # and never store the summary, so run the write-back version in a thread.
+        await run_in_threadpool(self.prune)
+
+
+def get_memory(session_id: str) -> SummaryBufferMemory:
+    """Returns the conversation memory for a session, creating it on first use."""
+    if REDIS_URL:
+        # Built fresh from Redis on every request, since another worker may have
+        # served the session's previous turn.
+        summary_key = f"summary_store:{session_id}"
+        summary = redis_client.get(summary_key)
+        chat_memory = RedisChatMessageHistory(session_id=session_id, url=REDIS_URL, ttl=SESSION_TTL)
+        # The history builds its own client; swap in the shared one so each turn
+        # doesn't open a new connection.
+        chat_memory.redis_client = redis_client
+        return RedisSummaryBufferMemory(
+            llm=llm,
+            max_token_limit=512,
+            memory_key="chat_history",
+            input_key="input",
+            return_messages=True,
+            chat_memory=chat_memory,
+            moving_summary_buffer=summary.decode("utf-8") if summary else "",
+            redis_client=redis_client,
+            summary_key=summary_key,
+        )
+
+    with chat_histories_lock:
+        memory = chat_histories.get(session_id)
+        if memory is None:
+            memory = SummaryBufferMemory(
+                llm=llm,
+                max_token_limit=512,
+                memory_key="chat_history",
+                input_key="input",
+                return_messages=True,
+            )
+        # Re-insert on every access so active sessions don't expire mid-conversation.
+        chat_histories[session_id] = memory
+        return memory
+
+class CalendarAgentExecutor(AgentExecutor):
+    """
+    Agent Executor that replies with a successful booking's confirmation directly,
+    instead of making a second LLM call just to rephrase it. Errors and busy slots
+    still go back to the model so it can retry or ask the user to clarify.
+    """
 
-prompt = PromptTemplate.from_template(prompt_template)
-prompt = prompt.partial(
-    today=today,
-    example_iso_time=example_iso_time,
+    def _get_tool_return(self, next_step_output):
+        agent_action, observation = next_step_output
+        if isinstance(observation, BookingConfirmation):
+            return AgentFinish({"output": str(observation)}, "")
+        return super()._get_tool_return(next_step_output)
+
+def get_agent_executor(memory: SummaryBufferMemory = None) -> AgentExecutor:
+    """Builds an Agent Executor, bound to a session's memory if one is given."""
+    return CalendarAgentExecutor(
+        agent=agent,
+        tools=tools,
+        memory=memory,
+        verbose=True,
+        handle_parsing_errors=True
+    )
+
+
+# --- Fast Path for Trivial Messages ---
+
+# Messages made up of only a greeting, thanks or goodbye are answered with a
+# canned reply, so they don't cost an LLM call.
+TRIVIAL_MESSAGE_PATTERN = re.compile(
+    r'^\s*(?:(?P<greeting>hi|hello|hey)|(?P<thanks>thanks|thank you)|(?P<bye>bye|goodbye))[\s!.,]*$',
+    re.IGNORECASE,
 )
 
-# 3. Create the agent
-agent = create_react_agent(llm, tools, prompt)
+CANNED_REPLIES = {
+    "greeting": "Hello! I'm TailorTalk. I can check your calendar's availability and book appointments. What would you like to do?",
+    "thanks": "You're welcome! Let me know if there's anything else you'd like to book.",
+    "bye": "Goodbye! Have a great day.",
+}
 
-# 4. Create the Agent Executor
-chat_histories = {}
-agent_executor = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    verbose=True,
-    handle_parsing_errors=True
-)
+def get_canned_reply(message: str):
+    """Returns a canned reply if the message is a trivial greeting, thanks or goodbye, else None."""
+    match = TRIVIAL_MESSAGE_PATTERN.match(message)
+    if match is None:
+        return None
+    return CANNED_REPLIES[match.lastgroup]
 
 
 # --- FastAPI Endpoints ---
@@ -185,26 +562,94 @@ class ChatRequest(BaseModel):
     session_id: str = "default_session"
 
 @app.post("/chat")
-async def chat_with_agent(request: ChatRequest):
-    """Handles the main chat interaction with the Langchain agent."""
-    session_id = request.session_id
-    
-    if session_id not in chat_histories:
-        chat_histories[session_id] = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-    
-    memory = chat_histories[session_id]
-    
-    response = agent_executor.invoke({
-        "input": request.message,
-        "chat_history": memory.chat_memory.messages
-    })
-    
-    memory.chat_memory.add_user_message(request.message)
-    memory.chat_memory.add_ai_message(response['output'])
-    
+def chat_with_agent(request: ChatRequest):
+    """
+    Handles the main chat interaction with the Langchain agent.
+    This is a plain `def` so FastAPI runs it in its threadpool; the agent and the
+    Google client block on network calls and would otherwise stall the event loop.
+    """
+    memory = get_memory(request.session_id)
+
+    canned_reply = get_canned_reply(request.message)
+    if canned_reply is not None:
+        memory.save_context({"input": request.message}, {"output": canned_reply})
+        return {"response": canned_reply}
+
+    agent_executor = get_agent_executor(memory)
+
+    # The executor loads the chat history from memory and saves the new turn,
+    # summarising older messages once the buffer exceeds its token limit.
+    response = agent_executor.invoke(get_agent_inputs(request.message))
+
     return {"response": response['output']}
 
 
+def _sse(data: dict) -> str:
+    """Formats a dict as a Server-Sent Events frame."""
+    return f"data: {json.dumps(data)}\n\n"
+
+def _chunk_text(chunk) -> str:
+    """Returns the text of a streamed message chunk, ignoring tool-call parts."""
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in chunk.content if isinstance(part, (str, dict))
+    )
+
+@app.post("/chat/stream")
+async def stream_chat_with_agent(request: ChatRequest):
+    """
+    Streams the agent's response as Server-Sent Events, one `token` frame per
+    generated chunk, so the UI can render the reply as it is produced.
+    """
+    memory = await run_in_threadpool(get_memory, request.session_id)
+
+    async def event_source():
+        canned_reply = get_canned_reply(request.message)
+        if canned_reply is not None:
+            await run_in_threadpool(memory.save_context, {"input": request.message}, {"output": canned_reply})
+            yield _sse({"token": canned_reply})
+            return
+
+        # The executor runs its memory hooks synchronously, which would block the
+        # event loop on Redis and summarisation calls. So it gets no memory here,
+        # and the history is loaded and saved in the threadpool instead.
+        inputs = get_agent_inputs(request.message)
+        inputs.update(await run_in_threadpool(memory.load_memory_variables, inputs))
+        agent_executor = get_agent_executor()
+        # `streamed` is the text of the current agent LLM call; `sent_any` tracks
+        # whether any text has reached the client at all. Text the model emits
+        # alongside a tool call is already on screen when the next call starts,
+        # so the next call's text is separated from it by a blank line.
+        streamed = ""
+        sent_any = False
+        try:
+            async for event in agent_executor.astream_events(inputs, version="v2"):
+                kind = event["event"]
+                if kind == "on_chat_model_start" and AGENT_TAG in event["tags"]:
+                    streamed = ""
+                elif kind == "on_chat_model_stream" and AGENT_TAG in event["tags"]:
+                    text = _chunk_text(event["data"]["chunk"])
+                    if text:
+                        if sent_any and not streamed:
+                            yield _sse({"token": "\n\n"})
+                        streamed += text
+                        sent_any = True
+                        yield _sse({"token": text})
+                elif kind == "on_chain_end" and not event["parent_ids"]:
+                    # Booking confirmations are returned directly, without a final
+                    # LLM call, so that answer hasn't been streamed yet.
+                    output = event["data"]["output"]["output"]
+                    if output.strip() != streamed.strip():
+                        yield _sse({"token": ("\n\n" if sent_any else "") + output})
+                    await run_in_threadpool(memory.save_context, {"input": request.message}, {"output": output})
+        except Exception as e:
+            yield _sse({"error": f"An error occurred: {e}"})
+
+    return StreamingResponse(event_source(), media_type="text/event-stream")
+
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the TailorTalk Agent API!"}
\ No newline at end of file
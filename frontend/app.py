@@ -1,6 +1,14 @@
+import json
+import os
 import streamlit as st
 import requests
 import uuid
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -17,7 +25,9 @@ st.caption("Your friendly AI agent for booking appointments")
 # We store the chat history and a unique session ID.
 
 # The backend API URL
-BACKEND_URL = "http://127.0.0.1:8000/chat" 
+# The port matches run_app.py's BACKEND_PORT, so overriding it there still works.
+BACKEND_URL = f"http://127.0.0.1:{os.getenv('BACKEND_PORT', '8000')}/chat"
+STREAM_URL = f"{BACKEND_URL}/stream"
 
 
 
@@ -25,6 +35,15 @@ BACKEND_URL = "http://127.0.0.1:8000/chat"
 if 'session_id' not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
 
+# Reuse one HTTP session per user so the connection to the backend stays open
+# between messages instead of being re-established every turn.
+if "http" not in st.session_state:
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.3))
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    st.session_state.http = http
+
 # Initialize chat history (messages) if it doesn't exist
 if "messages" not in st.session_state:
     st.session_state.messages = [
@@ -34,6 +53,24 @@ if "messages" not in st.session_state:
 
 # --- Chat Interface ---
 
+def stream_response(payload):
+    """Yields the agent's reply piece by piece from the backend's event stream."""
+    with st.session_state.http.post(STREAM_URL, json=payload, stream=True, timeout=60) as response:
+        response.raise_for_status()  # Raises an exception for bad status codes
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            try:
+                event = json.loads(line[len("data: "):])
+            except json.JSONDecodeError:
+                continue  # Skip malformed frames rather than failing the whole reply
+            if not isinstance(event, dict):
+                continue
+            if "error" in event:
+                yield event["error"]
+            else:
+                yield event.get("token", "")
+
 # Display previous messages
 for msg in st.session_state.messages:
     st.chat_message(msg["role"]).write(msg["content"])
@@ -50,22 +87,16 @@ if prompt := st.chat_input("What would you like to do?"):
         "session_id": st.session_state.session_id
     }
     
-    # Show a thinking spinner while waiting for the backend
-    with st.spinner("Thinking..."):
-        try:
-            # Send the message to the backend API
-            response = requests.post(BACKEND_URL, json=payload)
-            response.raise_for_status()  # Raises an exception for bad status codes
-            
-            # Get the agent's response from the JSON
-            agent_response = response.json().get("response")
-
-            # Add agent's response to session state and display it
-            st.session_state.messages.append({"role": "assistant", "content": agent_response})
-            st.chat_message("assistant").write(agent_response)
-
-        except requests.exceptions.RequestException as e:
-            # Handle connection errors or other request issues
-            error_message = f"Failed to connect to the backend: {e}"
-            st.error(error_message)
-            st.session_state.messages.append({"role": "assistant", "content": error_message})
+    try:
+        # Send the message to the backend API and render the reply as it streams in
+        with st.chat_message("assistant"):
+            agent_response = st.write_stream(stream_response(payload))
+
+        # Add agent's response to session state
+        st.session_state.messages.append({"role": "assistant", "content": agent_response})
+
+    except requests.exceptions.RequestException as e:
+        # Handle connection errors or other request issues
+        error_message = f"Failed to connect to the backend: {e}"
+        st.error(error_message)
+        st.session_state.messages.append({"role": "assistant", "content": error_message})
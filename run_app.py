@@ -0,0 +1,62 @@
+import os
+import signal
+import subprocess
+import sys
+
+from dotenv import load_dotenv
+
+
+# Load environment variables from .env file
+load_dotenv()
+
+# The frontend reads BACKEND_PORT too, and the child processes inherit it.
+BACKEND_PORT = os.getenv('BACKEND_PORT', '8000')
+FRONTEND_PORT = os.getenv('FRONTEND_PORT', '8501')
+
+# Chat memory is only shared between workers when it lives in Redis, so
+# without REDIS_URL the backend runs as a single process.
+# uvicorn reads its worker count from WEB_CONCURRENCY, and the backend reads it
+# too so it can turn off caches that would go stale across workers.
+DEFAULT_WORKERS = (os.cpu_count() or 1) if os.getenv('REDIS_URL') else 1
+WORKERS = os.getenv('WORKERS', str(DEFAULT_WORKERS))
+
+
+def main():
+    """Starts the backend and frontend as separate processes and waits for them."""
+    processes = [
+        subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "backend.main:app",
+            "--host", "0.0.0.0", "--port", BACKEND_PORT,
+        ], env={**os.environ, "WEB_CONCURRENCY": WORKERS}),
+        subprocess.Popen([
+            sys.executable, "-m", "streamlit", "run", "frontend/app.py",
+            "--server.port", FRONTEND_PORT,
+        ]),
+    ]
+
+    def shutdown(signum, frame):
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    # If either process exits, stop the other one too.
+    while all(process.poll() is None for process in processes):
+        try:
+            processes[0].wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+    shutdown(None, None)
+
+    for process in processes:
+        process.wait()
+
+    # A child killed by a signal has a negative return code; report it the way
+    # shells do (128 + signal number) rather than letting it wrap around.
+    return max(128 - code if code < 0 else code for code in (process.returncode for process in processes))
+
+
+if __name__ == "__main__":
+    sys.exit(main())